@@ -0,0 +1,209 @@
+import json
+import re
+import unicodedata
+from collections import defaultdict
+from pathlib import Path
+
+# Common Nepal abbreviations and spelling variants, mapped to one spelling
+ADDRESS_ALIASES = {
+    'ktm': 'kathmandu',
+    'kathmandou': 'kathmandu',
+    'kathamandu': 'kathmandu',
+    'ltp': 'lalitpur',
+    'bkt': 'bhaktapur',
+    'bhaktpur': 'bhaktapur',
+    'pkr': 'pokhara',
+    'pokhra': 'pokhara',
+    'brt': 'biratnagar',
+    'birganj': 'birgunj',
+    'nepalganj': 'nepalgunj',
+    'dhangadi': 'dhangadhi',
+    'janakpurdham': 'janakpur',
+    'chitawan': 'chitwan',
+    'kavre': 'kavrepalanchok',
+    'kavrepalanchowk': 'kavrepalanchok',
+    'sindhupalchowk': 'sindhupalchok',
+    'koteshwar': 'koteshwor',
+    'chok': 'chowk',
+    'chk': 'chowk',
+    'marga': 'marg',
+    'mg': 'marg',
+    'rd': 'road',
+    'tole': 'tol',
+    'hwy': 'highway',
+    'gaupalika': 'rural municipality',
+    'nagarpalika': 'municipality',
+}
+
+# Phrases that carry no location information once the country is fixed
+ADDRESS_NOISE_PATTERNS = [
+    r'\bnepal\b',
+    r'\b(?:koshi|madhesh|bagmati|bagamati|gandaki|lumbini|karnali|sudurpashchim|sudurpaschim)\s+province\b',
+    r'\bprovince\s+(?:no\s*)?\d+\b',
+    r'\b(?:sub\s+)?metropolitan\s+city\b',
+    r'\bpost\s+box\s+(?:no\s*)?\d+\b',
+    r'\bp\s*o\s+box\s+\d+\b',
+    r'\bward\s+(?:no\s*)?\d+\b',
+    r'\bwada\s+(?:no\s*)?\d+\b',
+]
+
+# Place names that Geoapify and users put right before a postcode
+# ("Kathmandu 44600", "Kaski 33700")
+POSTCODE_PLACES = {
+    'kathmandu', 'lalitpur', 'bhaktapur', 'pokhara', 'biratnagar', 'birgunj',
+    'bharatpur', 'butwal', 'dharan', 'hetauda', 'janakpur', 'nepalgunj',
+    'dhangadhi', 'itahari', 'birendranagar', 'damak', 'tansen', 'ghorahi',
+}
+_DISTRICTS_FILE = Path(__file__).resolve().parent / 'data' / 'districts.json'
+with open(_DISTRICTS_FILE, encoding='utf-8') as _handle:
+    POSTCODE_PLACES.update(
+        ADDRESS_ALIASES.get(word, word)
+        for district in json.load(_handle)
+        for word in district['name'].lower().split()
+    )
+
+_NOISE_RE = re.compile('|'.join(ADDRESS_NOISE_PATTERNS))
+_WARD_SUFFIX_RE = re.compile(r'\b([a-z]+)\s*-\s*\d{1,2}\b')  # e.g. "lalitpur-09"
+_PUNCTUATION_RE = re.compile(r'[^a-z0-9\s]+')
+_WHITESPACE_RE = re.compile(r'\s+')
+_POSTCODE_RE = re.compile(r'\d{5}')
+
+
+def normalize_address(address):
+    """
+    Reduce an address to a canonical form used as the geocoding cache key.
+    Folds case, accents, punctuation and whitespace, expands common
+    abbreviations and strips ward numbers, postcodes, province and country.
+    """
+    if not address:
+        return ''
+
+    text = unicodedata.normalize('NFKD', str(address))
+    text = text.encode('ascii', 'ignore').decode('ascii').lower()
+    text = _WARD_SUFFIX_RE.sub(r'\1', text)
+    text = _PUNCTUATION_RE.sub(' ', text)
+    text = _WHITESPACE_RE.sub(' ', text)
+
+    tokens = [ADDRESS_ALIASES.get(token, token) for token in text.split()]
+    text = _NOISE_RE.sub(' ', ' '.join(tokens))
+    text = ' '.join(_strip_postcodes(text.split()))
+
+    # Drop repeated tokens ("kathmandu, kathmandu") while keeping order
+    seen = set()
+    canonical = []
+    for token in text.split():
+        if token not in seen:
+            seen.add(token)
+            canonical.append(token)
+    return ' '.join(canonical)
+
+
+def _strip_postcodes(tokens):
+    """
+    Drop 5-digit tokens in postcode position: right after a district or
+    city name, or at the very end. Other numbers (house numbers) are kept.
+    """
+    kept = []
+    for i, token in enumerate(tokens):
+        if _POSTCODE_RE.fullmatch(token):
+            after_place = i > 0 and tokens[i - 1] in POSTCODE_PLACES
+            if after_place or i == len(tokens) - 1:
+                continue
+        kept.append(token)
+    return kept
+
+
+def numeric_tokens(text):
+    """
+    Numbers in a normalized address (house numbers, road numbers)
+    """
+    return frozenset(token for token in text.split() if token.isdigit())
+
+
+def trigrams(text):
+    """
+    Character trigrams of a normalized string, padded so that word
+    boundaries contribute to the similarity score
+    """
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class AddressIndex:
+    """
+    In-memory trigram index over normalized addresses.
+    Resolves near-duplicate strings to a known entry using the Dice
+    coefficient of their trigram sets. Candidates must contain exactly
+    the same numbers as the query, so "house 41" never matches "house 14".
+
+    Trigrams shared by more than ``max_postings`` entries (" ka", "kat")
+    are not used to find candidates, only to score them.
+    """
+
+    def __init__(self, threshold=0.85, max_postings=500):
+        self.threshold = threshold
+        self.max_postings = max_postings
+        self._entries = {}  # normalized address -> (trigram set, numbers, value)
+        self._postings = defaultdict(set)  # trigram -> normalized addresses
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def add(self, key, value):
+        """
+        Add (or replace) a normalized address and its payload
+        """
+        if not key:
+            return
+        grams = trigrams(key)
+        self._entries[key] = (grams, numeric_tokens(key), value)
+        for gram in grams:
+            self._postings[gram].add(key)
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        return entry[2] if entry else None
+
+    def match(self, key, threshold=None):
+        """
+        Find the closest known address to ``key``.
+        Returns (matched_key, value, score) or None if nothing scores
+        at or above the threshold.
+        """
+        if not key:
+            return None
+        if key in self._entries:
+            return key, self._entries[key][2], 1.0
+
+        threshold = self.threshold if threshold is None else threshold
+        grams = trigrams(key)
+        numbers = numeric_tokens(key)
+
+        # Dice >= threshold bounds the candidate's trigram count
+        min_size = len(grams) * threshold / (2 - threshold)
+        max_size = len(grams) * (2 - threshold) / threshold if threshold > 0 else float('inf')
+
+        candidates = set()
+        for gram in grams:
+            posting = self._postings.get(gram, ())
+            if len(posting) <= self.max_postings:
+                candidates.update(posting)
+
+        best = None
+        best_score = 0.0
+        for candidate in candidates:
+            candidate_grams, candidate_numbers, _ = self._entries[candidate]
+            if candidate_numbers != numbers:
+                continue
+            if not min_size <= len(candidate_grams) <= max_size:
+                continue
+            score = 2.0 * len(grams & candidate_grams) / (len(grams) + len(candidate_grams))
+            if score > best_score:
+                best, best_score = candidate, score
+
+        if best is None or best_score < threshold:
+            return None
+        return best, self._entries[best][2], best_score
@@ -1,9 +1,15 @@
 from django.contrib import admin
-from .models import DeliveryCalculation
+from .models import DeliveryCalculation, GeocodedPlace
 
 @admin.register(DeliveryCalculation)
 class DeliveryCalculationAdmin(admin.ModelAdmin):
     list_display = ['pickup_location', 'delivery_location', 'weight', 'total_price', 'created_at']
-    list_filter = ['package_type', 'is_fragile', 'needs_insurance', 'created_at']
+    list_filter = ['package_type', 'is_fragile', 'needs_insurance', 'pickup_zone', 'delivery_zone', 'created_at']
     search_fields = ['pickup_location', 'delivery_location']
-    readonly_fields = ['distance', 'total_price', 'created_at']
\ No newline at end of file
+    readonly_fields = ['distance', 'total_price', 'pickup_zone', 'delivery_zone', 'created_at']
+
+@admin.register(GeocodedPlace)
+class GeocodedPlaceAdmin(admin.ModelAdmin):
+    list_display = ['normalized_address', 'latitude', 'longitude', 'hit_count', 'created_at']
+    search_fields = ['normalized_address', 'raw_address', 'formatted_address']
+    readonly_fields = ['hit_count', 'created_at']
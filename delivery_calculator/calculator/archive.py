@@ -0,0 +1,419 @@
+import json
+import operator
+import os
+import struct
+import sys
+import tempfile
+import zlib
+from array import array
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone as django_timezone
+
+ARCHIVE_MAGIC = b'QARC1\n'
+ARCHIVE_SUFFIX = '.qarc'
+
+# Column name -> encoding used in the archive files
+ARCHIVE_COLUMNS = [
+    ('id', 'delta'),
+    ('created_at', 'timestamp'),
+    ('pickup_location', 'dictionary'),
+    ('delivery_location', 'dictionary'),
+    ('length', 'decimal'),
+    ('width', 'decimal'),
+    ('height', 'decimal'),
+    ('weight', 'decimal'),
+    ('package_type', 'dictionary'),
+    ('is_fragile', 'bitmap'),
+    ('needs_insurance', 'bitmap'),
+    ('distance', 'decimal'),
+    ('total_price', 'decimal'),
+    ('pickup_zone', 'dictionary'),
+    ('delivery_zone', 'dictionary'),
+]
+ARCHIVE_COLUMN_NAMES = [name for name, _ in ARCHIVE_COLUMNS]
+
+# Value of columns added after a file was written, e.g. zones in older archives
+ARCHIVE_COLUMN_DEFAULTS = {
+    'pickup_zone': '',
+    'delivery_zone': '',
+}
+
+DECIMAL_SCALE = 100  # all archived decimals have two decimal places
+DECIMAL_QUANTUM = Decimal('0.01')
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+FILTER_OPERATORS = {
+    '=': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    'in': lambda value, options: value in options,
+}
+
+
+def get_archive_dir():
+    return Path(getattr(settings, 'QUOTE_ARCHIVE_DIR', Path(settings.BASE_DIR) / 'archive'))
+
+
+def archive_path(month, directory=None):
+    """
+    Path of the archive file for a (year, month) tuple
+    """
+    directory = Path(directory) if directory else get_archive_dir()
+    year, month_number = month
+    return directory / f"quotes-{year:04d}-{month_number:02d}{ARCHIVE_SUFFIX}"
+
+
+# ---------------------------------------------------------------------------
+# Column encodings
+# ---------------------------------------------------------------------------
+
+def _int_array_bytes(values, typecode='q'):
+    data = array(typecode, values)
+    if sys.byteorder == 'big':
+        data.byteswap()
+    return data.tobytes()
+
+
+def _int_array_from_bytes(raw, typecode='q'):
+    data = array(typecode)
+    data.frombytes(raw)
+    if sys.byteorder == 'big':
+        data.byteswap()
+    return data
+
+
+def _pack_bits(flags):
+    packed = bytearray((len(flags) + 7) // 8)
+    for i, flag in enumerate(flags):
+        if flag:
+            packed[i >> 3] |= 1 << (i & 7)
+    return bytes(packed)
+
+
+def _unpack_bits(raw, count):
+    return [bool(raw[i >> 3] & (1 << (i & 7))) for i in range(count)]
+
+
+def _to_micros(value):
+    # Naive values are in the current time zone, as the ORM treats them
+    if django_timezone.is_naive(value):
+        value = django_timezone.make_aware(value)
+    delta = value - EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+
+def _from_micros(micros):
+    value = EPOCH + timedelta(microseconds=micros)
+    if not getattr(settings, 'USE_TZ', True):
+        value = django_timezone.make_naive(value)
+    return value
+
+
+def _encode_deltas(numbers):
+    deltas = []
+    previous = 0
+    for number in numbers:
+        deltas.append(number - previous)
+        previous = number
+    return _int_array_bytes(deltas)
+
+
+def _decode_deltas(raw):
+    numbers = []
+    current = 0
+    for delta in _int_array_from_bytes(raw):
+        current += delta
+        numbers.append(current)
+    return numbers
+
+
+def encode_column(encoding, values):
+    """
+    Encode a column of Python values to bytes (before compression)
+    """
+    if encoding == 'delta':
+        return _encode_deltas(values)
+
+    if encoding == 'timestamp':
+        return _encode_deltas([_to_micros(value) for value in values])
+
+    if encoding == 'decimal':
+        present = [value is not None for value in values]
+        scaled = [int((value * DECIMAL_SCALE).to_integral_value()) if value is not None else 0
+                  for value in values]
+        bitmap = _pack_bits(present)
+        return struct.pack('<I', len(bitmap)) + bitmap + _int_array_bytes(scaled)
+
+    if encoding == 'dictionary':
+        dictionary = {}
+        codes = [dictionary.setdefault(value, len(dictionary)) for value in values]
+        words = json.dumps(list(dictionary)).encode('utf-8')
+        return struct.pack('<I', len(words)) + words + _int_array_bytes(codes, 'I')
+
+    if encoding == 'bitmap':
+        return _pack_bits(values)
+
+    raise ValueError(f"Unknown column encoding: {encoding}")
+
+
+def decode_column(encoding, raw, count):
+    """
+    Decode bytes produced by encode_column back to Python values
+    """
+    if encoding == 'delta':
+        return _decode_deltas(raw)
+
+    if encoding == 'timestamp':
+        return [_from_micros(micros) for micros in _decode_deltas(raw)]
+
+    if encoding == 'decimal':
+        (bitmap_length,) = struct.unpack_from('<I', raw)
+        present = _unpack_bits(raw[4:4 + bitmap_length], count)
+        scaled = _int_array_from_bytes(raw[4 + bitmap_length:])
+        return [(Decimal(number) / DECIMAL_SCALE).quantize(DECIMAL_QUANTUM) if is_present else None
+                for number, is_present in zip(scaled, present)]
+
+    if encoding == 'dictionary':
+        (words_length,) = struct.unpack_from('<I', raw)
+        words = json.loads(raw[4:4 + words_length].decode('utf-8'))
+        return [words[code] for code in _int_array_from_bytes(raw[4 + words_length:], 'I')]
+
+    if encoding == 'bitmap':
+        return _unpack_bits(raw, count)
+
+    raise ValueError(f"Unknown column encoding: {encoding}")
+
+
+def _stat_value(encoding, value):
+    """
+    JSON-safe representation of a min/max statistic
+    """
+    if value is None:
+        return None
+    if encoding == 'timestamp':
+        return _to_micros(value)
+    if encoding == 'decimal':
+        return str(value)
+    return value
+
+
+def _stat_from_json(encoding, value):
+    if value is None:
+        return None
+    if encoding == 'timestamp':
+        return _from_micros(value)
+    if encoding == 'decimal':
+        return Decimal(value)
+    return value
+
+
+# ---------------------------------------------------------------------------
+# Archive files
+# ---------------------------------------------------------------------------
+
+def write_archive(path, rows):
+    """
+    Write rows (dicts keyed by ARCHIVE_COLUMN_NAMES) to a compressed
+    columnar file, replacing any existing file atomically.
+    Rows are stored ordered by id.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    rows = sorted(rows, key=lambda row: row['id'])
+
+    header = {'rows': len(rows), 'columns': {}}
+    blocks = []
+    offset = 0
+    for name, encoding in ARCHIVE_COLUMNS:
+        values = [row[name] for row in rows]
+        block = zlib.compress(encode_column(encoding, values), 9)
+        present = [value for value in values if value is not None]
+        header['columns'][name] = {
+            'encoding': encoding,
+            'offset': offset,
+            'length': len(block),
+            'nulls': len(values) - len(present),
+            'min': _stat_value(encoding, min(present)) if present else None,
+            'max': _stat_value(encoding, max(present)) if present else None,
+        }
+        blocks.append(block)
+        offset += len(block)
+
+    header_bytes = json.dumps(header).encode('utf-8')
+    fd, temp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as handle:
+            handle.write(ARCHIVE_MAGIC)
+            handle.write(struct.pack('<I', len(header_bytes)))
+            handle.write(header_bytes)
+            for block in blocks:
+                handle.write(block)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return header
+
+
+class ArchiveFile:
+    """
+    Lazily decoded view of one archive file.
+    Only the header is read up front; column blocks are decompressed
+    on first access.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, 'rb') as handle:
+            if handle.read(len(ARCHIVE_MAGIC)) != ARCHIVE_MAGIC:
+                raise ValueError(f"Not a quote archive: {self.path}")
+            (header_length,) = struct.unpack('<I', handle.read(4))
+            self.header = json.loads(handle.read(header_length).decode('utf-8'))
+            self._data_start = handle.tell()
+        self.rows = self.header['rows']
+        self._columns = {}
+
+    def stats(self, name):
+        """
+        (min, max) of a column as Python values
+        """
+        if name not in self.header['columns']:
+            default = ARCHIVE_COLUMN_DEFAULTS[name]
+            return (default, default)
+        meta = self.header['columns'][name]
+        return (_stat_from_json(meta['encoding'], meta['min']),
+                _stat_from_json(meta['encoding'], meta['max']))
+
+    def column(self, name):
+        if name not in self._columns and name not in self.header['columns']:
+            self._columns[name] = [ARCHIVE_COLUMN_DEFAULTS[name]] * self.rows
+        if name not in self._columns:
+            meta = self.header['columns'][name]
+            with open(self.path, 'rb') as handle:
+                handle.seek(self._data_start + meta['offset'])
+                raw = zlib.decompress(handle.read(meta['length']))
+            self._columns[name] = decode_column(meta['encoding'], raw, self.rows)
+        return self._columns[name]
+
+    def may_match(self, filters):
+        """
+        False if column statistics prove no row can satisfy the filters
+        """
+        for name, op, value in filters:
+            low, high = self.stats(name)
+            if low is None:
+                if op != '!=':
+                    return False
+                continue
+            if op == '=' and (value < low or value > high):
+                return False
+            if op == '<' and low >= value:
+                return False
+            if op == '<=' and low > value:
+                return False
+            if op == '>' and high <= value:
+                return False
+            if op == '>=' and high < value:
+                return False
+            if op == 'in' and not any(low <= option <= high for option in value):
+                return False
+        return True
+
+    def read_rows(self):
+        """
+        All rows of the file as dicts
+        """
+        columns = [self.column(name) for name in ARCHIVE_COLUMN_NAMES]
+        return [dict(zip(ARCHIVE_COLUMN_NAMES, values)) for values in zip(*columns)]
+
+
+def _coerce_filter_value(name, encoding, value):
+    """
+    Convert a filter value to the Python type stored in the column
+    """
+    try:
+        if encoding == 'timestamp':
+            if not isinstance(value, datetime):
+                raise TypeError
+            # Compare timestamps in one form regardless of how they were passed
+            return _from_micros(_to_micros(value))
+        if encoding == 'decimal':
+            return Decimal(str(value))
+        if encoding == 'delta':
+            if isinstance(value, bool):
+                raise TypeError
+            return int(value)
+        if encoding == 'bitmap':
+            if value in (True, False):
+                return bool(value)
+            raise TypeError
+        return str(value)
+    except (TypeError, ValueError, InvalidOperation):
+        raise ValueError(f"Invalid filter value for {name} ({encoding}): {value!r}")
+
+
+def _normalize_filters(filters):
+    encodings = dict(ARCHIVE_COLUMNS)
+    normalized = []
+    for name, op, value in filters or []:
+        if name not in encodings:
+            raise ValueError(f"Unknown archive column: {name}")
+        if op not in FILTER_OPERATORS:
+            raise ValueError(f"Unsupported filter operator: {op}")
+        if op == 'in':
+            value = [_coerce_filter_value(name, encodings[name], v) for v in value]
+        else:
+            value = _coerce_filter_value(name, encodings[name], value)
+        normalized.append((name, op, value))
+    return normalized
+
+
+def scan_archive(columns=None, filters=None, directory=None):
+    """
+    Iterate archived quotes as dicts.
+
+    ``columns`` limits which columns are decoded and returned (all by default).
+    ``filters`` is a list of (column, operator, value) tuples combined with AND;
+    operators are =, !=, <, <=, >, >= and in. Files whose min/max statistics
+    rule out a match are skipped without decompressing any column data.
+    """
+    directory = Path(directory) if directory else get_archive_dir()
+    columns = list(columns) if columns else list(ARCHIVE_COLUMN_NAMES)
+    for name in columns:
+        if name not in ARCHIVE_COLUMN_NAMES:
+            raise ValueError(f"Unknown archive column: {name}")
+    filters = _normalize_filters(filters)
+
+    if not directory.exists():
+        return
+
+    for path in sorted(directory.glob(f"quotes-*{ARCHIVE_SUFFIX}")):
+        archive = ArchiveFile(path)
+        if not archive.may_match(filters):
+            continue
+
+        selected = range(archive.rows)
+        for name, op, value in filters:
+            compare = FILTER_OPERATORS[op]
+            data = archive.column(name)
+            selected = [i for i in selected
+                        if data[i] is not None and compare(data[i], value)]
+            if not selected:
+                break
+        if not selected:
+            continue
+
+        projected = [archive.column(name) for name in columns]
+        for i in selected:
+            yield {name: data[i] for name, data in zip(columns, projected)}
@@ -0,0 +1,80 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from calculator.archive import (
+    ARCHIVE_COLUMN_NAMES, ArchiveFile, archive_path, get_archive_dir, write_archive,
+)
+from calculator.models import DeliveryCalculation
+
+
+class Command(BaseCommand):
+    help = (
+        "Move quotes older than a given age out of the live table into "
+        "compressed monthly column files"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-days', type=int,
+            default=getattr(settings, 'QUOTE_ARCHIVE_AFTER_DAYS', 180),
+            help='Archive quotes created more than this many days ago',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Number of rows deleted from the live table per transaction',
+        )
+        parser.add_argument(
+            '--directory', default=None,
+            help='Archive directory (defaults to QUOTE_ARCHIVE_DIR)',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Report what would be archived without writing or deleting',
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['older_than_days'])
+        batch_size = max(1, options['batch_size'])
+        directory = options['directory'] or get_archive_dir()
+
+        old_quotes = DeliveryCalculation.objects.filter(created_at__lt=cutoff)
+        months = old_quotes.dates('created_at', 'month', order='ASC')
+
+        total_archived = 0
+        for month_start in months:
+            month = (month_start.year, month_start.month)
+            month_quotes = old_quotes.filter(
+                created_at__year=month_start.year,
+                created_at__month=month_start.month,
+            )
+            rows = list(month_quotes.values(*ARCHIVE_COLUMN_NAMES).iterator())
+            if not rows:
+                continue
+
+            path = archive_path(month, directory)
+            if options['dry_run']:
+                self.stdout.write(f"Would archive {len(rows)} quotes to {path}")
+                total_archived += len(rows)
+                continue
+
+            # Merge with an earlier run for the same month; ids already in the
+            # file (e.g. from an interrupted run) are replaced, not duplicated
+            merged = {row['id']: row for row in rows}
+            if path.exists():
+                for row in ArchiveFile(path).read_rows():
+                    merged.setdefault(row['id'], row)
+            write_archive(path, merged.values())
+
+            # Only delete once the archive file is safely on disk
+            ids = [row['id'] for row in rows]
+            for start in range(0, len(ids), batch_size):
+                with transaction.atomic():
+                    DeliveryCalculation.objects.filter(pk__in=ids[start:start + batch_size]).delete()
+
+            total_archived += len(rows)
+            self.stdout.write(f"✓ Archived {len(rows)} quotes to {path}")
+
+        verb = 'Would archive' if options['dry_run'] else 'Archived'
+        self.stdout.write(f"{verb} {total_archived} quotes created before {cutoff:%Y-%m-%d}")
@@ -0,0 +1,123 @@
+import time
+from decimal import Decimal, InvalidOperation
+from django.core.management.base import BaseCommand, CommandError
+from calculator.models import DeliveryCalculation
+from calculator.ratecard import (
+    DEFAULT_WEIGHT_BANDS, RATE_CARD_FIELDS, build_distances, diff_rate_cards,
+    ROAD_DETOUR_FACTOR, district_zones, generate_rate_card, load_distance_matrix, load_districts, read_rate_card,
+    write_rate_card,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate the published rate card (every district pair x package "
+        "type x weight band) from the PriceCalculator tariff"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'output',
+            help='Output file; .json writes JSON, anything else writes CSV',
+        )
+        parser.add_argument(
+            '--districts', default=None,
+            help='District headquarters JSON (defaults to calculator/data/districts.json)',
+        )
+        parser.add_argument(
+            '--distances', default=None,
+            help='Precomputed road distances JSON as {origin: {destination: km}}',
+        )
+        parser.add_argument(
+            '--estimate-distances', action='store_true',
+            help='Allow great-circle estimates for pairs missing from --distances',
+        )
+        parser.add_argument(
+            '--weight-bands', default=None,
+            help='Comma-separated weight band upper bounds in kg, e.g. 0.5,1,2,5',
+        )
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='Number of worker processes (defaults to the CPU count)',
+        )
+        parser.add_argument(
+            '--previous', default=None,
+            help='Previous rate card to diff the new one against',
+        )
+        parser.add_argument(
+            '--diff-output', default=None,
+            help='Write changed, added and removed rows to this CSV/JSON file',
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+
+        weight_bands = DEFAULT_WEIGHT_BANDS
+        if options['weight_bands']:
+            try:
+                weight_bands = [Decimal(band.strip()) for band in options['weight_bands'].split(',')]
+            except InvalidOperation:
+                raise CommandError(f"Invalid weight bands: {options['weight_bands']}")
+            if not all(band.is_finite() and band > 0 for band in weight_bands):
+                raise CommandError("--weight-bands must be finite positive weights")
+            if any(lower >= upper for lower, upper in zip(weight_bands, weight_bands[1:])):
+                raise CommandError("--weight-bands must be strictly increasing")
+
+        if options['workers'] is not None and options['workers'] < 1:
+            raise CommandError("--workers must be at least 1")
+
+        districts = load_districts(options['districts'])
+        matrix = load_distance_matrix(options['distances']) if options['distances'] else None
+        distances, estimated = build_distances(districts, matrix)
+        if estimated and not options['estimate_distances']:
+            raise CommandError(
+                f"{estimated} district pairs have no precomputed distance; pass --distances "
+                f"with a complete matrix or --estimate-distances to use great-circle estimates"
+            )
+        if estimated:
+            self.stdout.write(self.style.WARNING(
+                f"⚠ WARNING: {estimated} district pairs priced on great-circle distance "
+                f"x {ROAD_DETOUR_FACTOR}, not road distance"
+            ))
+        package_types = [code for code, _ in DeliveryCalculation.PACKAGE_TYPES]
+
+        zones = district_zones(districts)
+        unserviceable = sorted(name for name, zone in zones.items() if zone and not zone.serviceable)
+        if unserviceable:
+            self.stdout.write(f"Skipping unserviceable districts: {', '.join(unserviceable)}")
+
+        # Read the previous card first: it is often the file being regenerated
+        previous = read_rate_card(options['previous']) if options['previous'] else None
+
+        rows = generate_rate_card(distances, package_types, weight_bands, options['workers'], zones)
+        write_rate_card(options['output'], rows)
+
+        priced = len(districts) - len(unserviceable)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"✓ Wrote {len(rows)} rates ({priced} districts, "
+            f"{len(package_types)} package types, {len(weight_bands)} weight bands) "
+            f"to {options['output']} in {elapsed:.1f}s"
+        )
+
+        if previous is not None:
+            current = [dict(zip(RATE_CARD_FIELDS, row)) for row in rows]
+            diff = diff_rate_cards(previous, current)
+            self.stdout.write(
+                f"Compared with {options['previous']}: {len(diff['changed'])} changed, "
+                f"{len(diff['added'])} added, {len(diff['removed'])} removed"
+            )
+
+            if options['diff_output']:
+                diff_rows = (
+                    [{**row, 'status': 'changed'} for row in diff['changed']]
+                    + [{**row, 'status': 'added'} for row in diff['added']]
+                    + [{**row, 'status': 'removed'} for row in diff['removed']]
+                )
+                fields = RATE_CARD_FIELDS + ['previous_price', 'change', 'status']
+                write_rate_card(
+                    options['diff_output'],
+                    [[row.get(field, '') for field in fields] for row in diff_rows],
+                    fields,
+                )
+                self.stdout.write(f"✓ Wrote {len(diff_rows)} differences to {options['diff_output']}")
@@ -0,0 +1,98 @@
+import heapq
+from operator import itemgetter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from calculator.address import AddressIndex, normalize_address
+from calculator.archive import scan_archive
+from calculator.models import DeliveryCalculation, GeocodedPlace
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay DeliveryCalculation history (live and archived) and report how many upstream "
+        "geocoding calls each caching strategy would have needed"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threshold', type=float,
+            default=getattr(settings, 'GEOCODE_FUZZY_THRESHOLD', 0.85),
+            help='Minimum trigram similarity for a fuzzy match',
+        )
+        parser.add_argument(
+            '--archive-dir', default=None,
+            help='Archive directory (defaults to QUOTE_ARCHIVE_DIR)',
+        )
+
+    def handle(self, *args, **options):
+        threshold = options['threshold']
+
+        raw_seen = set()
+        normalized_seen = set()
+        fuzzy_index = AddressIndex(threshold=threshold)
+        lookups = raw_misses = normalized_misses = fuzzy_misses = 0
+
+        # How much of the history the current place cache already covers
+        place_index = AddressIndex(threshold=threshold)
+        for key in GeocodedPlace.objects.values_list('normalized_address', flat=True):
+            place_index.add(key, key)
+        covered = 0
+
+        # Archive files are per month and rows within a file are in id
+        # order, so both sources already come out in created_at order
+        live = (
+            DeliveryCalculation.objects
+            .order_by('created_at')
+            .values_list('created_at', 'pickup_location', 'delivery_location')
+            .iterator()
+        )
+        archived = (
+            (row['created_at'], row['pickup_location'], row['delivery_location'])
+            for row in scan_archive(
+                ['created_at', 'pickup_location', 'delivery_location'],
+                directory=options['archive_dir'],
+            )
+        )
+
+        for _, pickup, delivery in heapq.merge(archived, live, key=itemgetter(0)):
+            for address in (pickup, delivery):
+                lookups += 1
+                key = normalize_address(address)
+
+                if address not in raw_seen:
+                    raw_seen.add(address)
+                    raw_misses += 1
+
+                if key not in normalized_seen:
+                    normalized_seen.add(key)
+                    normalized_misses += 1
+
+                if fuzzy_index.match(key) is None:
+                    fuzzy_index.add(key, address)
+                    fuzzy_misses += 1
+
+                if place_index.match(key):
+                    covered += 1
+
+        if not lookups:
+            self.stdout.write("No delivery calculations in history.")
+            return
+
+        self.stdout.write(f"Geocoding lookups in history: {lookups}")
+        self.stdout.write(f"Fuzzy threshold: {threshold:.2f}")
+        self.stdout.write("")
+        self.stdout.write(f"{'Strategy':<28}{'Upstream calls':>16}{'Hit rate':>12}")
+        for label, misses in [
+            ('No cache', lookups),
+            ('Raw string key', raw_misses),
+            ('Normalized key', normalized_misses),
+            ('Normalized + fuzzy', fuzzy_misses),
+        ]:
+            hit_rate = 100.0 * (lookups - misses) / lookups
+            self.stdout.write(f"{label:<28}{misses:>16}{hit_rate:>11.1f}%")
+        self.stdout.write("")
+        self.stdout.write(
+            f"Current place cache ({len(place_index)} places) resolves "
+            f"{covered}/{lookups} historical lookups ({100.0 * covered / lookups:.1f}%)"
+        )
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('calculator', '0002_geocodedplace'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deliverycalculation',
+            name='delivery_zone',
+            field=models.CharField(blank=True, max_length=50),
+        ),
+        migrations.AddField(
+            model_name='deliverycalculation',
+            name='pickup_zone',
+            field=models.CharField(blank=True, max_length=50),
+        ),
+    ]
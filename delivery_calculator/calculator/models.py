@@ -21,10 +21,30 @@ class DeliveryCalculation(models.Model):
     
     distance = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     total_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    pickup_zone = models.CharField(max_length=50, blank=True)
+    delivery_zone = models.CharField(max_length=50, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
         ordering = ['-created_at']
     
     def __str__(self):
-        return f"{self.pickup_location} → {self.delivery_location}"
\ No newline at end of file
+        return f"{self.pickup_location} → {self.delivery_location}"
+
+class GeocodedPlace(models.Model):
+    """
+    Cached geocoding result keyed by the canonical form of an address
+    """
+    normalized_address = models.CharField(max_length=255, unique=True)
+    raw_address = models.CharField(max_length=255)
+    formatted_address = models.CharField(max_length=255, blank=True)
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    hit_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['normalized_address']
+
+    def __str__(self):
+        return f"{self.normalized_address} ({self.latitude}, {self.longitude})"
@@ -0,0 +1,231 @@
+import csv
+import json
+import math
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+from pathlib import Path
+
+import django
+from django.apps import apps
+
+DISTRICTS_FILE = Path(__file__).resolve().parent / 'data' / 'districts.json'
+
+# Upper bound (kg) of each published weight band
+DEFAULT_WEIGHT_BANDS = [
+    Decimal('0.5'), Decimal('1'), Decimal('2'), Decimal('5'),
+    Decimal('10'), Decimal('20'), Decimal('30'), Decimal('50'),
+]
+
+# Road distance is longer than great-circle distance, more so in the hills
+ROAD_DETOUR_FACTOR = Decimal('1.5')
+
+# Distance charged for deliveries within the same district
+LOCAL_DISTANCE_KM = Decimal('10.0')
+
+RATE_CARD_FIELDS = [
+    'origin', 'destination', 'distance_km', 'package_type',
+    'weight_band', 'max_weight_kg', 'price',
+]
+
+
+def load_districts(path=None):
+    """
+    Load [{name, province, latitude, longitude}, ...] district headquarters
+    """
+    with open(path or DISTRICTS_FILE, encoding='utf-8') as handle:
+        return json.load(handle)
+
+
+def load_distance_matrix(path):
+    """
+    Load precomputed road distances as {origin: {destination: km}}
+    """
+    with open(path, encoding='utf-8') as handle:
+        data = json.load(handle)
+    return {
+        origin: {destination: Decimal(str(km)) for destination, km in row.items()}
+        for origin, row in data.items()
+    }
+
+
+def great_circle_km(origin, destination):
+    """
+    Haversine distance in kilometers between two (lat, lon) points
+    """
+    lat1, lon1 = map(math.radians, origin)
+    lat2, lon2 = map(math.radians, destination)
+    a = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    return 6371.0 * 2 * math.asin(math.sqrt(a))
+
+
+def build_distances(districts, matrix=None):
+    """
+    Distance (km) for every ordered district pair.
+    Uses the precomputed matrix where it has an entry, otherwise the
+    great-circle distance scaled by ROAD_DETOUR_FACTOR.
+    Returns (distances, estimated) where estimated counts the ordered
+    pairs that fell back to the great-circle estimate.
+    """
+    matrix = matrix or {}
+    distances = {}
+    estimated = 0
+    for origin in districts:
+        row = {}
+        for destination in districts:
+            if origin['name'] == destination['name']:
+                km = LOCAL_DISTANCE_KM
+            else:
+                km = matrix.get(origin['name'], {}).get(destination['name'])
+                if km is None:
+                    km = matrix.get(destination['name'], {}).get(origin['name'])
+                if km is None:
+                    straight = great_circle_km(
+                        (origin['latitude'], origin['longitude']),
+                        (destination['latitude'], destination['longitude']),
+                    )
+                    km = Decimal(str(round(straight, 2))) * ROAD_DETOUR_FACTOR
+                    estimated += 1
+            row[destination['name']] = km.quantize(Decimal('0.01'))
+        distances[origin['name']] = row
+    return distances, estimated
+
+
+def weight_band_label(lower, upper):
+    return f"{lower}-{upper}"
+
+
+def _init_worker():
+    # Workers started with "spawn" or "forkserver" need their own app registry
+    if not apps.ready:
+        django.setup()
+
+
+def district_zones(districts):
+    """
+    Delivery zone of each district headquarters ({name: Zone or None}),
+    or an empty dict if zone checks are disabled
+    """
+    from .zones import get_zone_index
+
+    zone_index = get_zone_index()
+    if zone_index is None:
+        return {}
+    return {
+        district['name']: zone_index.lookup(district['latitude'], district['longitude'])
+        for district in districts
+    }
+
+
+def price_origin(origin, destinations, package_types, weight_bands, zones=None):
+    """
+    Price every destination/package type/weight band for one origin.
+    Returns a list of rows in RATE_CARD_FIELDS order.
+    """
+    from .utils import PriceCalculator
+
+    zones = zones or {}
+    rows = []
+    for destination, distance in destinations:
+        for package_type in package_types:
+            lower = Decimal('0')
+            for upper in weight_bands:
+                breakdown = PriceCalculator.price_for_distance(distance, {
+                    'length': Decimal('0'),
+                    'width': Decimal('0'),
+                    'height': Decimal('0'),
+                    'weight': upper,
+                    'package_type': package_type,
+                }, zones.get(origin), zones.get(destination))
+                rows.append([
+                    origin, destination, str(distance), package_type,
+                    weight_band_label(lower, upper), str(upper),
+                    f"{breakdown['total']:.2f}",
+                ])
+                lower = upper
+    return rows
+
+
+def generate_rate_card(distances, package_types, weight_bands, workers=None, zones=None):
+    """
+    Price the full rate card, one process-pool task per origin district.
+    Districts whose zone is not serviceable are left out.
+    """
+    zones = zones or {}
+    serviceable = {
+        name for name in distances
+        if zones.get(name) is None or zones[name].serviceable
+    }
+    tasks = [
+        (
+            origin,
+            sorted((destination, km) for destination, km in row.items() if destination in serviceable),
+            package_types,
+            weight_bands,
+            zones,
+        )
+        for origin, row in sorted(distances.items())
+        if origin in serviceable
+    ]
+    rows = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        for origin_rows in pool.map(price_origin, *zip(*tasks)):
+            rows.extend(origin_rows)
+    return rows
+
+
+def write_rate_card(path, rows, fields=RATE_CARD_FIELDS):
+    """
+    Write rows as CSV or JSON depending on the file suffix
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.suffix.lower() == '.json':
+        with open(path, 'w', encoding='utf-8') as handle:
+            json.dump([dict(zip(fields, row)) for row in rows], handle)
+    else:
+        with open(path, 'w', encoding='utf-8', newline='') as handle:
+            writer = csv.writer(handle)
+            writer.writerow(fields)
+            writer.writerows(rows)
+
+
+def read_rate_card(path):
+    """
+    Read a rate card written by write_rate_card as a list of dicts
+    """
+    path = Path(path)
+    with open(path, encoding='utf-8', newline='') as handle:
+        if path.suffix.lower() == '.json':
+            return json.load(handle)
+        return list(csv.DictReader(handle))
+
+
+def diff_rate_cards(previous, current):
+    """
+    Compare two rate cards (lists of dicts) by origin, destination,
+    package type and weight band.
+    Returns dict with 'added', 'removed' and 'changed' lists.
+    """
+    def key(row):
+        return (row['origin'], row['destination'], row['package_type'], row['weight_band'])
+
+    old = {key(row): row for row in previous}
+    new = {key(row): row for row in current}
+
+    changed = []
+    for row_key in sorted(old.keys() & new.keys()):
+        old_price = Decimal(old[row_key]['price'])
+        new_price = Decimal(new[row_key]['price'])
+        if old_price != new_price:
+            changed.append({
+                **new[row_key],
+                'previous_price': str(old_price),
+                'change': str(new_price - old_price),
+            })
+
+    return {
+        'added': [new[row_key] for row_key in sorted(new.keys() - old.keys())],
+        'removed': [old[row_key] for row_key in sorted(old.keys() - new.keys())],
+        'changed': changed,
+    }
@@ -1,3 +1,670 @@
-from django.test import TestCase
+import json
+import tempfile
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+from django.utils import timezone as django_timezone
+
+from . import utils, zones
+from .address import AddressIndex, normalize_address
+from .archive import (
+    ARCHIVE_COLUMN_NAMES, ARCHIVE_COLUMNS, ArchiveFile, archive_path, decode_column, encode_column,
+    scan_archive, write_archive,
+)
+from .models import DeliveryCalculation, GeocodedPlace
+from .ratecard import read_rate_card
+from .zones import ZoneIndex, get_zone_index, load_zones
+
+
+def geoapify_response(features):
+    response = mock.Mock(status_code=200)
+    response.json.return_value = {'features': features}
+    return response
+
+
+def geocode_feature(lat, lon):
+    return {
+        'geometry': {'coordinates': [lon, lat]},
+        'properties': {'country_code': 'np', 'formatted': 'Test place'},
+    }
+
+
+class NormalizeAddressTests(TestCase):
+
+    def test_variants_share_one_key(self):
+        for address in [
+            'Thamel, KTM',
+            'thamel kathmandu',
+            'Thamel, Kathmandu 44600, Nepal',
+            '  THAMEL,, Kathmandu Metropolitan City ',
+        ]:
+            self.assertEqual(normalize_address(address), 'thamel kathmandu', address)
+
+    def test_strips_ward_province_and_post_box(self):
+        self.assertEqual(
+            normalize_address('sankhamul ghat, Lalitpur-09, Lalitpur, Bagamati Province, Nepal'),
+            'sankhamul ghat lalitpur',
+        )
+        self.assertEqual(
+            normalize_address('Udhyog Marg, Lalitpur, Post Box No.: 6250, Nepal'),
+            'udhyog marg lalitpur',
+        )
+
+    def test_spelling_variants(self):
+        self.assertEqual(normalize_address('Ratna Chok, Pokhra'), 'ratna chowk pokhara')
+        self.assertEqual(normalize_address('Koteshwar, KTM'), 'koteshwor kathmandu')
+
+    def test_postcode_only_removed_in_postcode_position(self):
+        self.assertEqual(normalize_address('Ratna Chowk, Kaski 33700, Nepal'), 'ratna chowk kaski')
+        self.assertEqual(normalize_address('Thamel 44600'), 'thamel')
+        self.assertEqual(normalize_address('House 12345 Thamel'), 'house 12345 thamel')
+
+    def test_ambiguous_words_are_not_expanded(self):
+        # Patan is also a municipality in Baitadi; "St." is usually a saint
+        self.assertEqual(normalize_address('Patan, Baitadi'), 'patan baitadi')
+        self.assertEqual(normalize_address('Patan Dhoka, Lalitpur'), 'patan dhoka lalitpur')
+        self.assertEqual(normalize_address("St. Xavier's College, Maitighar"), 'st xavier s college maitighar')
+
+    def test_empty(self):
+        self.assertEqual(normalize_address(''), '')
+        self.assertEqual(normalize_address(None), '')
+
+
+class AddressIndexTests(TestCase):
+
+    def test_exact_and_fuzzy_match(self):
+        index = AddressIndex(threshold=0.85)
+        index.add('thamel kathmandu', 1)
+
+        self.assertEqual(index.match('thamel kathmandu'), ('thamel kathmandu', 1, 1.0))
+        key, value, score = index.match('thamell kathmandu')
+        self.assertEqual((key, value), ('thamel kathmandu', 1))
+        self.assertGreaterEqual(score, 0.85)
+
+    def test_threshold(self):
+        index = AddressIndex(threshold=0.85)
+        index.add('thamel kathmandu', 1)
+
+        self.assertIsNone(index.match('jhamsikhel lalitpur'))
+        self.assertIsNone(index.match('thamel'))
+        self.assertIsNotNone(index.match('thamel', threshold=0.5))
+
+    def test_numbers_must_match_exactly(self):
+        index = AddressIndex(threshold=0.85)
+        index.add('house 14 jhamsikhel road lalitpur', 1)
+
+        self.assertIsNone(index.match('house 41 jhamsikhel road lalitpur'))
+        self.assertIsNone(index.match('house jhamsikhel road lalitpur'))
+
+    def test_common_trigrams_do_not_produce_candidates(self):
+        index = AddressIndex(threshold=0.85, max_postings=2)
+        for number, place in enumerate(['kalimati', 'kalanki', 'kamalpokhari']):
+            index.add(f"{place} kathmandu", number)
+
+        # Only shares the common " ka"/"kat"/... trigrams with the entries
+        self.assertIsNone(index.match('kathmandu'))
+        self.assertEqual(index.match('kalankii kathmandu')[1], 1)
+
+
+@override_settings(GEOAPIFY_API_KEY='test-key')
+class GeocodeCacheTests(TestCase):
+
+    def setUp(self):
+        utils._place_index = None
+
+    def test_variants_make_one_upstream_call(self):
+        response = geoapify_response([geocode_feature(27.71, 85.31)])
+        with mock.patch('calculator.utils.requests.get', return_value=response) as get:
+            calculator = utils.PriceCalculator()
+            for address in ['Thamel, Kathmandu 44600, Nepal', 'Thamel, KTM', 'thamell kathmandu']:
+                self.assertEqual(calculator.geocode_address(address), (27.71, 85.31))
+
+        self.assertEqual(get.call_count, 1)
+        self.assertEqual(GeocodedPlace.objects.get().normalized_address, 'thamel kathmandu')
+
+    def test_hit_counts_are_recorded(self):
+        place = GeocodedPlace.objects.create(
+            normalized_address='thamel kathmandu', raw_address='Thamel', latitude=27.71, longitude=85.31,
+        )
+        calculator = utils.PriceCalculator()
+
+        calculator.lookup_cached_address('Thamel, KTM')
+        place.refresh_from_db()
+        self.assertEqual(place.hit_count, 1)
+
+        calculator.lookup_cached_address('thamel kathmandu')
+        place.refresh_from_db()
+        self.assertEqual(place.hit_count, 2)
+
+
+class GeocodeHitReportTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        settings_override = override_settings(QUOTE_ARCHIVE_DIR=self.directory)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def create_quote(self, pickup, delivery):
+        return DeliveryCalculation.objects.create(
+            pickup_location=pickup, delivery_location=delivery,
+            length=Decimal('1'), width=Decimal('1'), height=Decimal('1'), weight=Decimal('1'),
+        )
+
+    def test_report(self):
+        self.create_quote('Thamel, KTM', 'Ratna Chowk, Pokhara')
+        self.create_quote('Thamel, Kathmandu 44600, Nepal', 'Ratna Chok, Pokhra')
+        self.create_quote('thamell kathmandu', 'Ratna Chowk, Pokhara')
+        GeocodedPlace.objects.create(
+            normalized_address='thamel kathmandu', raw_address='Thamel', latitude=27.71, longitude=85.31,
+        )
+
+        out = StringIO()
+        call_command('geocode_hit_report', stdout=out)
+        lines = {line.split('  ')[0]: line.split() for line in out.getvalue().splitlines() if line}
+
+        self.assertIn('Geocoding lookups in history: 6', out.getvalue())
+        self.assertEqual(lines['No cache'][-2], '6')
+        self.assertEqual(lines['Raw string key'][-2], '5')
+        self.assertEqual(lines['Normalized key'][-2], '3')
+        self.assertEqual(lines['Normalized + fuzzy'][-2], '2')
+        self.assertIn('resolves 3/6 historical lookups', out.getvalue())
+
+    def test_includes_archived_quotes(self):
+        archived_at = django_timezone.make_aware(datetime(2024, 3, 10, 12, 0))
+        write_archive(archive_path((2024, 3), self.directory), [
+            archive_row(100000, archived_at, pickup_location='Thamel, KTM',
+                        delivery_location='Ratna Chowk, Pokhara'),
+        ])
+        self.create_quote('Thamel, Kathmandu 44600, Nepal', 'Ratna Chok, Pokhra')
+
+        out = StringIO()
+        call_command('geocode_hit_report', stdout=out)
+        lines = {line.split('  ')[0]: line.split() for line in out.getvalue().splitlines() if line}
+
+        self.assertIn('Geocoding lookups in history: 4', out.getvalue())
+        self.assertEqual(lines['Raw string key'][-2], '4')
+        # The archived quote came first, so the live one is the cache hit
+        self.assertEqual(lines['Normalized key'][-2], '2')
+
+    def test_empty_history(self):
+        out = StringIO()
+        call_command('geocode_hit_report', stdout=out)
+        self.assertIn('No delivery calculations in history.', out.getvalue())
+
+
+def archive_row(id, created_at, **fields):
+    row = {
+        'id': id,
+        'created_at': created_at,
+        'pickup_location': 'Thamel, KTM',
+        'delivery_location': 'Ratna Chowk, Pokhara',
+        'length': Decimal('10.00'),
+        'width': Decimal('20.00'),
+        'height': Decimal('30.00'),
+        'weight': Decimal('1.00'),
+        'package_type': 'standard',
+        'is_fragile': False,
+        'needs_insurance': False,
+        'distance': Decimal('200.50'),
+        'total_price': Decimal('1500.00'),
+        'pickup_zone': 'kathmandu_valley',
+        'delivery_zone': 'hill',
+    }
+    row.update(fields)
+    return row
+
+
+class ArchiveEncodingTests(TestCase):
+
+    def assertRoundTrip(self, encoding, values):
+        raw = encode_column(encoding, values)
+        self.assertEqual(decode_column(encoding, raw, len(values)), values)
+
+    def test_delta(self):
+        self.assertRoundTrip('delta', [5, 6, 7, 100, 3, -2])
+
+    def test_timestamp(self):
+        self.assertRoundTrip('timestamp', [
+            datetime(2025, 1, 1, 3, 0, 0, 123456, tzinfo=timezone.utc),
+            datetime(2024, 12, 31, tzinfo=timezone.utc),
+            datetime(2025, 6, 15, 12, 30, tzinfo=timezone.utc),
+        ])
+
+    def test_decimal_with_nulls(self):
+        self.assertRoundTrip('decimal', [Decimal('1.50'), None, Decimal('0.00'), Decimal('-3.25'), None])
+
+    def test_dictionary(self):
+        self.assertRoundTrip('dictionary', ['Thamel', 'Pokhara', 'Thamel', 'नेपाल', ''])
+
+    def test_bitmap(self):
+        self.assertRoundTrip('bitmap', [True, False, False, True, True, False, True, False, True])
+
+    def test_empty_columns(self):
+        for encoding in ['delta', 'timestamp', 'decimal', 'dictionary', 'bitmap']:
+            self.assertRoundTrip(encoding, [])
+
+
+class ArchiveFileTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        self.start = datetime(2025, 1, 15, 12, 0, tzinfo=timezone.utc)
+        rows = [
+            archive_row(id, self.start + timedelta(days=id), weight=Decimal(id), distance=None if id == 12 else Decimal('5.00'))
+            for id in range(10, 15)
+        ]
+        write_archive(archive_path((2025, 1), self.directory), rows)
+        self.archive = ArchiveFile(archive_path((2025, 1), self.directory))
+
+    def test_read_rows_round_trip(self):
+        rows = self.archive.read_rows()
+        self.assertEqual([row['id'] for row in rows], [10, 11, 12, 13, 14])
+        self.assertIsNone(rows[2]['distance'])
+        self.assertEqual(rows[0]['weight'], Decimal('10.00'))
+        self.assertEqual(self.archive.stats('weight'), (Decimal('10.00'), Decimal('14.00')))
+
+    def test_may_match_prunes_by_min_max(self):
+        # weight ranges from 10 to 14
+        cases = [
+            ('=', 12, True), ('=', 20, False), ('=', 5, False),
+            ('!=', 12, True),
+            ('<', 11, True), ('<', 10, False),
+            ('<=', 10, True), ('<=', 9, False),
+            ('>', 13, True), ('>', 14, False),
+            ('>=', 14, True), ('>=', 15, False),
+            ('in', [1, 12], True), ('in', [1, 20], False),
+        ]
+        for op, value, expected in cases:
+            filters = [('weight', op, Decimal(value)) if op != 'in' else ('weight', op, [Decimal(v) for v in value])]
+            self.assertEqual(self.archive.may_match(filters), expected, (op, value))
+
+    def test_scan_with_projection_and_filters(self):
+        rows = list(scan_archive(['id', 'weight'], [('weight', '>=', 13)], directory=self.directory))
+        self.assertEqual(rows, [{'id': 13, 'weight': Decimal('13.00')}, {'id': 14, 'weight': Decimal('14.00')}])
+
+        # NULL values never satisfy a comparison
+        self.assertEqual(
+            [row['id'] for row in scan_archive(['id'], [('distance', '!=', 1)], directory=self.directory)],
+            [10, 11, 13, 14],
+        )
+
+    def test_files_without_zone_columns_read_as_blank(self):
+        legacy_columns = [column for column in ARCHIVE_COLUMNS if not column[0].endswith('_zone')]
+        path = archive_path((2024, 1), self.directory)
+        with mock.patch('calculator.archive.ARCHIVE_COLUMNS', legacy_columns):
+            write_archive(path, [archive_row(1, self.start - timedelta(days=400))])
+
+        self.assertEqual(ArchiveFile(path).read_rows()[0]['pickup_zone'], '')
+        rows = list(scan_archive(['id', 'delivery_zone'], [('delivery_zone', '=', 'hill')], directory=self.directory))
+        self.assertEqual([row['id'] for row in rows], [10, 11, 12, 13, 14])
+
+    def test_pruned_file_is_not_decompressed(self):
+        with mock.patch('calculator.archive.zlib.decompress') as decompress:
+            self.assertEqual(list(scan_archive(filters=[('weight', '>', 100)], directory=self.directory)), [])
+        decompress.assert_not_called()
+
+    def test_filter_values_are_coerced(self):
+        self.assertEqual([row['id'] for row in scan_archive(['id'], [('id', '=', '12')], directory=self.directory)], [12])
+        self.assertEqual(len(list(scan_archive(['id'], [('weight', 'in', ['10', 11.0])], directory=self.directory))), 2)
+        with self.assertRaises(ValueError):
+            list(scan_archive(filters=[('id', '=', 'abc')], directory=self.directory))
+        with self.assertRaises(ValueError):
+            list(scan_archive(filters=[('created_at', '<', '2025-01-01')], directory=self.directory))
+        with self.assertRaises(ValueError):
+            list(scan_archive(filters=[('weight', '=', 'heavy')], directory=self.directory))
+
+    @override_settings(TIME_ZONE='Asia/Kathmandu')
+    def test_naive_created_at_uses_current_time_zone(self):
+        # The first row is 2025-01-25 12:00 UTC, i.e. 17:45 in Kathmandu
+        before = datetime(2025, 1, 25, 17, 0)
+        after = datetime(2025, 1, 25, 18, 0)
+        self.assertEqual(list(scan_archive(['id'], [('created_at', '<', before)], directory=self.directory)), [])
+        self.assertEqual(
+            [row['id'] for row in scan_archive(['id'], [('created_at', '<', after)], directory=self.directory)],
+            [10],
+        )
+
+
+class ArchiveQuotesCommandTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+    def create_quote(self, created_at, **fields):
+        quote = DeliveryCalculation.objects.create(
+            pickup_location='Thamel, KTM', delivery_location='Ratna Chowk, Pokhara',
+            length=Decimal('10'), width=Decimal('20'), height=Decimal('30'), weight=Decimal('1'),
+            distance=Decimal('200.50'), total_price=Decimal('1500.00'), **fields,
+        )
+        DeliveryCalculation.objects.filter(pk=quote.pk).update(created_at=created_at)
+        return quote
+
+    def test_merges_with_existing_month_and_deletes_archived_rows(self):
+        month_start = django_timezone.make_aware(datetime(2024, 3, 10, 12, 0))
+        old = [self.create_quote(month_start + timedelta(days=day)) for day in range(3)]
+        recent = self.create_quote(django_timezone.now())
+
+        # An earlier (interrupted) run already archived one of these rows
+        # together with a row that is no longer in the live table
+        path = archive_path((2024, 3), self.directory)
+        write_archive(path, [
+            archive_row(100000, month_start - timedelta(days=5)),
+            archive_row(old[0].pk, month_start, total_price=Decimal('1.00')),
+        ])
+
+        out = StringIO()
+        call_command('archive_quotes', '--older-than-days', '30', '--batch-size', '2',
+                     '--directory', str(self.directory), stdout=out)
+
+        rows = ArchiveFile(path).read_rows()
+        self.assertEqual([row['id'] for row in rows], [quote.pk for quote in old] + [100000])
+        # Live data wins over the stale copy from the earlier run
+        self.assertEqual(rows[0]['total_price'], Decimal('1500.00'))
+        self.assertEqual(set(rows[0]), set(ARCHIVE_COLUMN_NAMES))
+
+        self.assertEqual(list(DeliveryCalculation.objects.values_list('pk', flat=True)), [recent.pk])
+        self.assertIn('Archived 3 quotes', out.getvalue())
+
+    def test_dry_run_changes_nothing(self):
+        self.create_quote(django_timezone.now() - timedelta(days=400))
+        call_command('archive_quotes', '--dry-run', '--directory', str(self.directory), stdout=StringIO())
+        self.assertEqual(DeliveryCalculation.objects.count(), 1)
+        self.assertEqual(list(self.directory.iterdir()), [])
+
+
+class GenerateRateCardTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+        self.districts = self.directory / 'districts.json'
+        self.districts.write_text(json.dumps([
+            {'name': 'Kathmandu', 'province': 'Bagmati', 'latitude': 27.71, 'longitude': 85.32},
+            {'name': 'Kaski', 'province': 'Gandaki', 'latitude': 28.21, 'longitude': 83.99},
+            {'name': 'Mustang', 'province': 'Gandaki', 'latitude': 28.78, 'longitude': 83.72},
+        ]))
+        self.distances = self.directory / 'distances.json'
+        self.distances.write_text(json.dumps({
+            'Kathmandu': {'Kaski': 200.5, 'Mustang': 360},
+            'Kaski': {'Mustang': 160},
+        }))
+        self.card = self.directory / 'card.csv'
+
+        # Mustang falls in an unserviceable zone
+        self.zones_file = self.directory / 'zones.geojson'
+        self.zones_file.write_text(json.dumps({'type': 'FeatureCollection', 'features': [{
+            'type': 'Feature',
+            'properties': {'zone': 'remote', 'serviceable': False},
+            'geometry': {'type': 'Polygon', 'coordinates': [square(83.5, 28.5, 84.0, 29.0)]},
+        }]}))
+        settings_override = override_settings(DELIVERY_ZONES_FILE=self.zones_file)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        zones._zone_index = None
+        self.addCleanup(setattr, zones, '_zone_index', None)
+
+    def generate(self, *args):
+        out = StringIO()
+        call_command(
+            'generate_rate_card', str(self.card), '--districts', str(self.districts),
+            '--workers', '1', *args, stdout=out,
+        )
+        return out.getvalue()
+
+    def test_generates_card_for_serviceable_districts(self):
+        output = self.generate('--distances', str(self.distances), '--weight-bands', '1,5')
+
+        rows = read_rate_card(self.card)
+        # Kathmandu and Kaski (Mustang is unserviceable): 4 pairs x 4 types x 2 bands
+        self.assertEqual(len(rows), 32)
+        self.assertEqual({row['origin'] for row in rows}, {'Kathmandu', 'Kaski'})
+        self.assertIn('32 rates (2 districts, 4 package types, 2 weight bands)', output)
+        self.assertNotIn('WARNING', output)
+
+        row = next(row for row in rows if row['origin'] == 'Kaski' and row['destination'] == 'Kathmandu')
+        self.assertEqual(row['distance_km'], '200.50')
+
+    def test_zone_checks_are_off_by_default(self):
+        with override_settings(DELIVERY_ZONES_FILE=''):
+            output = self.generate('--distances', str(self.distances), '--weight-bands', '1,5')
+
+        self.assertIn('72 rates (3 districts, 4 package types, 2 weight bands)', output)
+        self.assertNotIn('unserviceable', output)
+
+    def test_regenerating_over_previous_card_diffs_against_old_contents(self):
+        self.generate('--distances', str(self.distances))
+        output = self.generate(
+            '--distances', str(self.distances), '--weight-bands', '0.5,1,2',
+            '--previous', str(self.card),
+        )
+        # 5 of the 8 default bands disappear for 4 pairs x 4 package types
+        self.assertIn('0 changed, 0 added, 80 removed', output)
+        self.assertEqual(len(read_rate_card(self.card)), 48)
+
+    def test_distances_are_required_unless_estimates_are_allowed(self):
+        with self.assertRaisesMessage(CommandError, '6 district pairs have no precomputed distance'):
+            self.generate()
+        self.assertFalse(self.card.exists())
+
+        output = self.generate('--estimate-distances')
+        self.assertIn('WARNING: 6 district pairs priced on great-circle distance', output)
+
+    def test_rejects_invalid_workers(self):
+        with self.assertRaisesMessage(CommandError, '--workers must be at least 1'):
+            self.generate('--distances', str(self.distances), '--workers', '0')
+
+    def test_rejects_invalid_weight_bands(self):
+        for bands in ['0,1', '-1,5', 'NaN', '1,Infinity']:
+            with self.assertRaisesMessage(CommandError, '--weight-bands must be finite positive weights'):
+                self.generate('--distances', str(self.distances), f'--weight-bands={bands}')
+        for bands in ['1,1,5', '5,1']:
+            with self.assertRaisesMessage(CommandError, '--weight-bands must be strictly increasing'):
+                self.generate('--distances', str(self.distances), f'--weight-bands={bands}')
+        self.assertFalse(self.card.exists())
+
+
+@override_settings(GEOAPIFY_API_KEY='test-key')
+class CalculatePriceTests(TestCase):
+
+    def setUp(self):
+        utils._place_index = None
+
+    def test_failed_geocode_is_not_retried(self):
+        with mock.patch('calculator.utils.requests.get', return_value=geoapify_response([])) as get:
+            breakdown = utils.PriceCalculator().calculate_price({
+                'pickup_location': 'Nowhere 1', 'delivery_location': 'Nowhere 2',
+                'length': Decimal('10'), 'width': Decimal('10'), 'height': Decimal('10'),
+                'weight': Decimal('1'), 'package_type': 'standard',
+            })
+
+        self.assertEqual(get.call_count, 2)
+        self.assertTrue(all('geocode' in call.args[0] for call in get.call_args_list))
+        self.assertEqual(breakdown['distance'], 15.0)
+
+
+def square(x1, y1, x2, y2):
+    return [[x1, y1], [x2, y1], [x2, y2], [x1, y2], [x1, y1]]
+
+
+ZONES_GEOJSON = {
+    'type': 'FeatureCollection',
+    'features': [
+        {
+            'type': 'Feature',
+            'properties': {'zone': 'outer', 'name': 'Outer', 'surcharge': 100},
+            'geometry': {'type': 'Polygon', 'coordinates': [square(0, 0, 10, 10), square(4, 4, 6, 6)]},
+        },
+        {
+            'type': 'Feature',
+            'properties': {'zone': 'inner', 'name': 'Inner'},
+            'geometry': {'type': 'Polygon', 'coordinates': [square(1, 1, 3, 3)]},
+        },
+        {
+            'type': 'Feature',
+            'properties': {'zone': 'ell', 'name': 'Ell', 'surcharge': 25.5},
+            'geometry': {'type': 'Polygon', 'coordinates': [
+                [[12, 0], [16, 0], [16, 2], [14, 2], [14, 6], [12, 6], [12, 0]],
+            ]},
+        },
+        {
+            'type': 'Feature',
+            'properties': {'zone': 'islands', 'name': 'Islands', 'serviceable': False},
+            'geometry': {'type': 'MultiPolygon', 'coordinates': [
+                [square(20, 0, 21, 1)],
+                [square(30, 0, 31, 1)],
+            ]},
+        },
+        {
+            'type': 'Feature',
+            'properties': {'zone': 'ignored'},
+            'geometry': {'type': 'Point', 'coordinates': [50, 50]},
+        },
+    ],
+}
+
+
+class ZoneFixtureMixin:
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.zones_file = Path(directory.name) / 'zones.geojson'
+        self.zones_file.write_text(json.dumps(ZONES_GEOJSON))
+
+        zones._zone_index = None
+        self.addCleanup(setattr, zones, '_zone_index', None)
+
+
+class ZoneIndexTests(ZoneFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.index = ZoneIndex(load_zones(self.zones_file), cell_size=1.0)
+
+    def lookup(self, lon, lat):
+        zone = self.index.lookup(lat, lon)
+        return zone.code if zone else None
+
+    def test_loads_polygon_and_multipolygon_features(self):
+        loaded = {zone.code: zone for zone in load_zones(self.zones_file)}
+        self.assertEqual(set(loaded), {'outer', 'inner', 'ell', 'islands'})
+        self.assertEqual(loaded['ell'].surcharge, Decimal('25.5'))
+        self.assertEqual(loaded['inner'].surcharge, Decimal('0'))
+        self.assertTrue(loaded['outer'].serviceable)
+        self.assertFalse(loaded['islands'].serviceable)
+
+    def test_point_in_polygon(self):
+        self.assertEqual(self.lookup(8, 8), 'outer')
+        self.assertIsNone(self.lookup(11, 5))
+        self.assertIsNone(self.lookup(-1, 5))
+        self.assertIsNone(self.lookup(50, 50))
+
+    def test_concave_polygon(self):
+        self.assertEqual(self.lookup(13, 4), 'ell')
+        self.assertEqual(self.lookup(15, 1), 'ell')
+        # Inside the bounding box but in the notch of the L
+        self.assertIsNone(self.lookup(15, 4))
+
+    def test_holes(self):
+        self.assertIsNone(self.lookup(5, 5))
+        self.assertEqual(self.lookup(3.5, 5), 'outer')
+
+    def test_smallest_overlapping_zone_wins(self):
+        self.assertEqual(self.lookup(2, 2), 'inner')
+
+    def test_multipolygon(self):
+        self.assertEqual(self.lookup(20.5, 0.5), 'islands')
+        self.assertEqual(self.lookup(30.5, 0.5), 'islands')
+        self.assertIsNone(self.lookup(25, 0.5))
+
+    def test_missing_file_disables_zones(self):
+        with override_settings(DELIVERY_ZONES_FILE=self.zones_file.with_name('missing.geojson')):
+            self.assertIsNone(get_zone_index())
+
+    def test_invalid_file_disables_zones(self):
+        def feature(coordinates, **properties):
+            return {
+                'type': 'Feature', 'properties': properties,
+                'geometry': {'type': 'Polygon', 'coordinates': coordinates},
+            }
+
+        for contents in [
+            '{"type": "FeatureCollection", "features": [',
+            json.dumps({'type': 'FeatureCollection', 'features': [feature([[]])]}),
+            json.dumps({'type': 'FeatureCollection', 'features': [feature([])]}),
+            json.dumps({'type': 'FeatureCollection', 'features': [
+                feature([square(0, 0, 1, 1)], surcharge='free'),
+            ]}),
+        ]:
+            self.zones_file.write_text(contents)
+            zones._zone_index = None
+            with override_settings(DELIVERY_ZONES_FILE=self.zones_file):
+                self.assertIsNone(get_zone_index())
+            self.assertIs(zones._zone_index, False)
+
+
+@override_settings(GEOAPIFY_API_KEY='test-key')
+class CalculatePriceZoneTests(ZoneFixtureMixin, TestCase):
+
+    COORDINATES = {
+        'Inner town': (2, 2),
+        'Outer village': (8, 8),
+        'Island camp': (0.5, 20.5),
+    }
+
+    def setUp(self):
+        super().setUp()
+        utils._place_index = None
+        settings_override = override_settings(DELIVERY_ZONES_FILE=self.zones_file)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def fake_get(self, url, params=None, **kwargs):
+        if 'geocode' in url:
+            lat, lon = self.COORDINATES[params['text']]
+            return geoapify_response([geocode_feature(lat, lon)])
+        return geoapify_response([{'properties': {'distance': 100000}}])
+
+    def post_quote(self, pickup, delivery):
+        return self.client.post('/calculate/', json.dumps({
+            'pickup_location': pickup, 'delivery_location': delivery,
+            'length': 10, 'width': 10, 'height': 10, 'weight': 1, 'package_type': 'standard',
+        }), content_type='application/json')
+
+    def test_unserviceable_point_is_rejected_before_routing(self):
+        with mock.patch('calculator.utils.requests.get', side_effect=self.fake_get) as get:
+            response = self.post_quote('Inner town', 'Island camp')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.json()['success'])
+        self.assertIn('Island camp', response.json()['error'])
+        self.assertFalse(any('routing' in call.args[0] for call in get.call_args_list))
+        self.assertFalse(DeliveryCalculation.objects.exists())
+
+    def test_zones_are_priced_and_saved(self):
+        with mock.patch('calculator.utils.requests.get', side_effect=self.fake_get) as get:
+            response = self.post_quote('Inner town', 'Outer village')
+
+        self.assertEqual(response.status_code, 200)
+        breakdown = response.json()['breakdown']
+        self.assertEqual((breakdown['pickup_zone'], breakdown['delivery_zone']), ('Inner', 'Outer'))
+        self.assertEqual(breakdown['zone_surcharge'], 100.0)
+        self.assertEqual(sum('routing' in call.args[0] for call in get.call_args_list), 1)
+
+        quote = DeliveryCalculation.objects.get()
+        self.assertEqual((quote.pickup_zone, quote.delivery_zone), ('inner', 'outer'))
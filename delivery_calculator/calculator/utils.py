@@ -1,6 +1,27 @@
 import requests
 from django.conf import settings
+from django.db.models import F
 from decimal import Decimal
+from .address import AddressIndex, normalize_address
+from .models import GeocodedPlace
+from .zones import UnserviceableLocation, get_zone_index
+
+_place_index = None
+
+
+def get_place_index():
+    """
+    Lazily build the process-wide fuzzy index over cached geocoded places
+    """
+    global _place_index
+    if _place_index is None:
+        threshold = getattr(settings, 'GEOCODE_FUZZY_THRESHOLD', 0.85)
+        index = AddressIndex(threshold=threshold)
+        for place_id, key in GeocodedPlace.objects.values_list('id', 'normalized_address'):
+            index.add(key, place_id)
+        _place_index = index
+    return _place_index
+
 
 class PriceCalculator:
     """
@@ -40,11 +61,66 @@ class PriceCalculator:
         else:
             print(f"✓ API Key loaded: {self.api_key[:10]}...")
     
+    def lookup_cached_address(self, address):
+        """
+        Resolve an address from the local place cache, first by its
+        normalized form and then by fuzzy match against known places.
+        Returns (latitude, longitude) tuple or None
+        """
+        key = normalize_address(address)
+        if not key:
+            return None
+
+        try:
+            place = GeocodedPlace.objects.filter(normalized_address=key).first()
+            if place is None:
+                match = get_place_index().match(key)
+                if match is None:
+                    return None
+                matched_key, place_id, score = match
+                place = GeocodedPlace.objects.filter(pk=place_id).first()
+                if place is None:
+                    return None
+                print(f"✓ Fuzzy cache match ({score:.2f}): '{key}' → '{matched_key}'")
+
+            GeocodedPlace.objects.filter(pk=place.pk).update(hit_count=F('hit_count') + 1)
+            print(f"✓ Geocode cache hit: {address} → ({place.latitude}, {place.longitude})")
+            return (place.latitude, place.longitude)
+        except Exception as e:
+            print(f"⚠ Geocode cache lookup error (non-critical): {e}")
+            return None
+
+    def cache_geocoded_address(self, address, coords, formatted_address=''):
+        """
+        Store a geocoding result under the normalized address
+        """
+        key = normalize_address(address)
+        if not key:
+            return
+
+        try:
+            place, _ = GeocodedPlace.objects.get_or_create(
+                normalized_address=key,
+                defaults={
+                    'raw_address': address[:255],
+                    'formatted_address': formatted_address[:255],
+                    'latitude': coords[0],
+                    'longitude': coords[1],
+                }
+            )
+            get_place_index().add(key, place.pk)
+        except Exception as e:
+            print(f"⚠ Geocode cache save error (non-critical): {e}")
+
     def geocode_address(self, address):
         """
         Convert address to coordinates using Geoapify Geocoding API
         Returns (latitude, longitude) tuple or None
         """
+        cached = self.lookup_cached_address(address)
+        if cached:
+            return cached
+
         if not self.api_key:
             print("⚠ WARNING: No Geoapify API key configured")
             return None
@@ -94,6 +170,7 @@ class PriceCalculator:
                 lat, lon = coords[1], coords[0]
                 formatted_address = nepal_results[0]['properties'].get('formatted', address)
                 print(f"✓ Geocoded to: ({lat}, {lon}) - {formatted_address}")
+                self.cache_geocoded_address(address, (lat, lon), formatted_address)
                 return (lat, lon)
             
             print(f"⚠ No geocoding results for: {address}")
@@ -108,9 +185,26 @@ class PriceCalculator:
             traceback.print_exc()
             return None
     
-    def get_distance(self, origin, destination):
+    def get_zone(self, coords, address):
         """
-        Get distance between two locations using Geoapify Routing API
+        Look up the delivery zone of geocoded coordinates
+        Returns Zone or None; raises UnserviceableLocation for zones we do not serve
+        """
+        zone_index = get_zone_index()
+        if not coords or zone_index is None:
+            return None
+        
+        zone = zone_index.lookup(coords[0], coords[1])
+        if zone is not None and not zone.serviceable:
+            raise UnserviceableLocation(
+                f"Sorry, we do not deliver to {address} ({zone.name} zone)"
+            )
+        return zone
+    
+    def get_route_distance(self, origin, destination, origin_coords, destination_coords):
+        """
+        Get distance between already geocoded locations using Geoapify Routing API
+        Coordinates are used as given; None (geocoding failed) is not retried
         Returns distance in kilometers
         """
         if not self.api_key:
@@ -118,11 +212,6 @@ class PriceCalculator:
             return Decimal('15.0')
         
         try:
-            # Geocode both addresses
-            print(f"=== Getting distance from '{origin}' to '{destination}' ===")
-            origin_coords = self.geocode_address(origin)
-            destination_coords = self.geocode_address(destination)
-            
             if not origin_coords:
                 print(f"⚠ Could not geocode origin: {origin}")
                 return Decimal('15.0')
@@ -173,12 +262,13 @@ class PriceCalculator:
             print(f"⚠ Error getting distance: {e}")
             return Decimal('15.0')
         except Exception as e:
-            print(f"⚠ Unexpected error in get_distance: {e}")
+            print(f"⚠ Unexpected error in get_route_distance: {e}")
             import traceback
             traceback.print_exc()
             return Decimal('15.0')
     
-    def calculate_volume(self, length, width, height):
+    @staticmethod
+    def calculate_volume(length, width, height):
         """
         Calculate volume in cubic meters
         Input dimensions are in centimeters
@@ -192,9 +282,33 @@ class PriceCalculator:
         Calculate comprehensive delivery price
         Returns dictionary with detailed breakdown
         """
-        # Extract data
         pickup = form_data['pickup_location']
         delivery = form_data['delivery_location']
+        
+        print(f"Calculating price from {pickup} to {delivery}")
+        
+        # Geocode and check zones before any routing call
+        pickup_coords = self.geocode_address(pickup)
+        delivery_coords = self.geocode_address(delivery)
+        pickup_zone = self.get_zone(pickup_coords, pickup)
+        delivery_zone = self.get_zone(delivery_coords, delivery)
+        
+        # Calculate distance
+        distance = self.get_route_distance(pickup, delivery, pickup_coords, delivery_coords)
+        
+        breakdown = self.price_for_distance(distance, form_data, pickup_zone, delivery_zone)
+        
+        print(f"Price breakdown: Total = NPR {breakdown['total']}")
+        return breakdown
+    
+    @classmethod
+    def price_for_distance(cls, distance, form_data, pickup_zone=None, delivery_zone=None):
+        """
+        Apply the tariff to a known distance (km) without any API calls
+        Zone surcharges are added for the pickup and delivery zones, if any
+        Returns dictionary with detailed breakdown
+        """
+        # Extract data
         length = form_data['length']
         width = form_data['width']
         height = form_data['height']
@@ -203,43 +317,42 @@ class PriceCalculator:
         is_fragile = form_data.get('is_fragile', False)
         needs_insurance = form_data.get('needs_insurance', False)
         
-        print(f"Calculating price from {pickup} to {delivery}")
-        
-        # Calculate distance
-        distance = self.get_distance(pickup, delivery)
-        
         # Calculate base price
-        base_price = self.BASE_RATE_PER_KM * distance
+        base_price = cls.BASE_RATE_PER_KM * distance
         
         # Calculate weight charge (if over threshold)
         weight_charge = Decimal('0')
-        if weight > self.WEIGHT_THRESHOLD:
-            excess_weight = weight - self.WEIGHT_THRESHOLD
-            weight_charge = excess_weight * self.WEIGHT_CHARGE_PER_KG
+        if weight > cls.WEIGHT_THRESHOLD:
+            excess_weight = weight - cls.WEIGHT_THRESHOLD
+            weight_charge = excess_weight * cls.WEIGHT_CHARGE_PER_KG
         
         # Calculate volume charge
-        volume = self.calculate_volume(length, width, height)
+        volume = cls.calculate_volume(length, width, height)
         volume_charge = Decimal('0')
-        if volume > self.VOLUME_THRESHOLD:
-            volume_charge = volume * self.VOLUME_CHARGE_PER_CBM
+        if volume > cls.VOLUME_THRESHOLD:
+            volume_charge = volume * cls.VOLUME_CHARGE_PER_CBM
         
         # Apply package type multiplier
-        type_multiplier = self.PACKAGE_TYPE_MULTIPLIERS.get(
+        type_multiplier = cls.PACKAGE_TYPE_MULTIPLIERS.get(
             package_type, 
             Decimal('1.3')
         )
         
         # Calculate subtotal with multipliers
-        subtotal = (base_price + weight_charge + volume_charge) * type_multiplier * self.ROAD_MULTIPLIER
+        subtotal = (base_price + weight_charge + volume_charge) * type_multiplier * cls.ROAD_MULTIPLIER
         
         # Additional charges
-        fuel_charge = base_price * self.FUEL_CHARGE_PERCENTAGE
-        service_charge = self.SERVICE_CHARGE
-        fragility_charge = self.FRAGILE_CHARGE if is_fragile else Decimal('0')
-        insurance_charge = self.INSURANCE_CHARGE if needs_insurance else Decimal('0')
+        fuel_charge = base_price * cls.FUEL_CHARGE_PERCENTAGE
+        service_charge = cls.SERVICE_CHARGE
+        fragility_charge = cls.FRAGILE_CHARGE if is_fragile else Decimal('0')
+        insurance_charge = cls.INSURANCE_CHARGE if needs_insurance else Decimal('0')
+        zone_surcharge = sum(
+            (zone.surcharge for zone in (pickup_zone, delivery_zone) if zone is not None),
+            Decimal('0')
+        )
         
         # Calculate total
-        total = subtotal + fuel_charge + service_charge + fragility_charge + insurance_charge
+        total = subtotal + fuel_charge + service_charge + fragility_charge + insurance_charge + zone_surcharge
         
         breakdown = {
             'distance': float(distance),
@@ -248,14 +361,18 @@ class PriceCalculator:
             'volume_charge': float(volume_charge),
             'volume': float(volume),
             'type_multiplier': float(type_multiplier),
-            'road_multiplier': float(self.ROAD_MULTIPLIER),
+            'road_multiplier': float(cls.ROAD_MULTIPLIER),
             'subtotal': float(subtotal),
             'fuel_charge': float(fuel_charge),
             'service_charge': float(service_charge),
             'fragility_charge': float(fragility_charge),
             'insurance_charge': float(insurance_charge),
+            'zone_surcharge': float(zone_surcharge),
+            'pickup_zone': pickup_zone.name if pickup_zone else None,
+            'delivery_zone': delivery_zone.name if delivery_zone else None,
+            'pickup_zone_code': pickup_zone.code if pickup_zone else '',
+            'delivery_zone_code': delivery_zone.code if delivery_zone else '',
             'total': float(total),
         }
         
-        print(f"Price breakdown: Total = NPR {total}")
         return breakdown
\ No newline at end of file
@@ -6,6 +6,7 @@ from django.conf import settings
 from decimal import Decimal
 from .utils import PriceCalculator
 from .models import DeliveryCalculation
+from .zones import UnserviceableLocation
 import json
 import traceback
 
@@ -74,7 +75,14 @@ def calculate_price_api(request):
         calculator = PriceCalculator()
         
         print("Calculating price...")
-        price_breakdown = calculator.calculate_price(form_data)
+        try:
+            price_breakdown = calculator.calculate_price(form_data)
+        except UnserviceableLocation as e:
+            print(f"⚠ Unserviceable location: {e}")
+            return JsonResponse({
+                'success': False,
+                'error': str(e)
+            }, status=400)
         print(f"Price breakdown calculated: {price_breakdown}")
         
         # Save calculation to database
@@ -90,7 +98,9 @@ def calculate_price_api(request):
                 is_fragile=form_data['is_fragile'],
                 needs_insurance=form_data['needs_insurance'],
                 distance=Decimal(str(price_breakdown['distance'])),
-                total_price=Decimal(str(price_breakdown['total']))
+                total_price=Decimal(str(price_breakdown['total'])),
+                pickup_zone=price_breakdown['pickup_zone_code'],
+                delivery_zone=price_breakdown['delivery_zone_code'],
             )
             print(f"✓ Saved to database with ID: {calculation.id}")
         except Exception as e:
@@ -0,0 +1,172 @@
+import json
+import math
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+
+from django.conf import settings
+
+_zone_index = None
+
+
+class UnserviceableLocation(ValueError):
+    """
+    Raised when a pickup or delivery point falls in a zone we do not serve
+    """
+
+
+class Zone:
+    """
+    One delivery zone polygon loaded from GeoJSON.
+    Rings are lists of (lon, lat) points; the first ring of each polygon
+    is the exterior and any others are holes.
+    """
+
+    def __init__(self, code, name, polygons, serviceable=True, surcharge=Decimal('0')):
+        self.code = code
+        self.name = name
+        self.polygons = polygons
+        self.serviceable = serviceable
+        self.surcharge = surcharge
+
+        points = [point for polygon in polygons for point in polygon[0]]
+        self.min_lon = min(lon for lon, _ in points)
+        self.max_lon = max(lon for lon, _ in points)
+        self.min_lat = min(lat for _, lat in points)
+        self.max_lat = max(lat for _, lat in points)
+        self.area = sum(_ring_area(polygon[0]) - sum(_ring_area(hole) for hole in polygon[1:])
+                        for polygon in polygons)
+
+    def __repr__(self):
+        return f"<Zone {self.code}>"
+
+    def contains(self, lat, lon):
+        if not (self.min_lon <= lon <= self.max_lon and self.min_lat <= lat <= self.max_lat):
+            return False
+        for polygon in self.polygons:
+            if _ring_contains(polygon[0], lon, lat) and \
+                    not any(_ring_contains(hole, lon, lat) for hole in polygon[1:]):
+                return True
+        return False
+
+
+def _ring_area(ring):
+    """
+    Planar (shoelace) area of a ring in square degrees
+    """
+    area = 0.0
+    for (x1, y1), (x2, y2) in zip(ring, ring[1:] + ring[:1]):
+        area += x1 * y2 - x2 * y1
+    return abs(area) / 2
+
+
+def _ring_contains(ring, x, y):
+    """
+    Even-odd ray casting test for a point against one ring
+    """
+    inside = False
+    j = len(ring) - 1
+    for i in range(len(ring)):
+        xi, yi = ring[i]
+        xj, yj = ring[j]
+        if (yi > y) != (yj > y) and x < (xj - xi) * (y - yi) / (yj - yi) + xi:
+            inside = not inside
+        j = i
+    return inside
+
+
+class ZoneIndex:
+    """
+    Uniform grid over zone bounding boxes.
+    Each cell lists the zones whose bounding box overlaps it, so a lookup
+    only runs the point-in-polygon test on a handful of candidates.
+    """
+
+    def __init__(self, zones, cell_size=0.1):
+        self.zones = zones
+        self.cell_size = cell_size
+        self._cells = defaultdict(list)
+        for zone in zones:
+            for cell_x in range(self._cell(zone.min_lon), self._cell(zone.max_lon) + 1):
+                for cell_y in range(self._cell(zone.min_lat), self._cell(zone.max_lat) + 1):
+                    self._cells[(cell_x, cell_y)].append(zone)
+        # Most specific (smallest) zone wins where zones overlap
+        for candidates in self._cells.values():
+            candidates.sort(key=lambda zone: zone.area)
+
+    def __len__(self):
+        return len(self.zones)
+
+    def _cell(self, value):
+        return math.floor(value / self.cell_size)
+
+    def lookup(self, lat, lon):
+        """
+        Zone containing the point, or None if it lies outside every zone
+        """
+        for zone in self._cells.get((self._cell(lon), self._cell(lat)), ()):
+            if zone.contains(lat, lon):
+                return zone
+        return None
+
+
+def load_zones(path):
+    """
+    Read zones from a GeoJSON FeatureCollection of Polygon/MultiPolygon
+    features with ``zone``, ``name``, ``serviceable`` and ``surcharge``
+    properties
+    """
+    with open(path, encoding='utf-8') as handle:
+        data = json.load(handle)
+
+    zones = []
+    for number, feature in enumerate(data.get('features', [])):
+        geometry = feature.get('geometry') or {}
+        properties = feature.get('properties') or {}
+        if geometry.get('type') == 'Polygon':
+            polygons = [geometry['coordinates']]
+        elif geometry.get('type') == 'MultiPolygon':
+            polygons = geometry['coordinates']
+        else:
+            continue
+
+        polygons = [
+            [[(float(point[0]), float(point[1])) for point in ring] for ring in polygon]
+            for polygon in polygons
+        ]
+        code = properties.get('zone') or f"zone-{number}"
+        zones.append(Zone(
+            code=code,
+            name=properties.get('name', code),
+            polygons=polygons,
+            serviceable=bool(properties.get('serviceable', True)),
+            surcharge=Decimal(str(properties.get('surcharge', 0))),
+        ))
+    return zones
+
+
+def get_zone_index():
+    """
+    Lazily build the process-wide zone index.
+    Returns None (zone checks disabled) if DELIVERY_ZONES_FILE is unset,
+    missing or cannot be parsed.
+    """
+    global _zone_index
+    if _zone_index is None:
+        path = getattr(settings, 'DELIVERY_ZONES_FILE', '')
+        if not path:
+            _zone_index = False
+        elif not Path(path).exists():
+            print(f"⚠ WARNING: Zones file not found, zone checks disabled: {path}")
+            _zone_index = False
+        else:
+            cell_size = getattr(settings, 'DELIVERY_ZONES_CELL_SIZE', 0.1)
+            try:
+                _zone_index = ZoneIndex(load_zones(path), cell_size=cell_size)
+            except (json.JSONDecodeError, KeyError, ValueError, TypeError, IndexError,
+                    InvalidOperation) as e:
+                print(f"⚠ WARNING: Invalid zones file, zone checks disabled: {path}: {e}")
+                _zone_index = False
+            else:
+                print(f"✓ Loaded {len(_zone_index)} delivery zones from {path}")
+    return _zone_index or None
@@ -60,6 +60,19 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 GEOAPIFY_API_KEY = config("GEOAPIFY_API_KEY")
 
+# Minimum trigram similarity for resolving an address from the geocode cache
+GEOCODE_FUZZY_THRESHOLD = config('GEOCODE_FUZZY_THRESHOLD', default=0.85, cast=float)
+
+# Quotes older than this are moved out of the live table by `archive_quotes`
+QUOTE_ARCHIVE_DIR = BASE_DIR / 'archive'
+QUOTE_ARCHIVE_AFTER_DAYS = config('QUOTE_ARCHIVE_AFTER_DAYS', default=180, cast=int)
+
+# GeoJSON polygons used for zone surcharges and serviceability checks.
+# Zone checks are off unless this is set; calculator/data/zones.example.geojson
+# shows the format but its boundaries and tariffs are placeholders.
+DELIVERY_ZONES_FILE = config('DELIVERY_ZONES_FILE', default='')
+DELIVERY_ZONES_CELL_SIZE = 0.1  # degrees
+
 
 
 CSRF_TRUSTED_ORIGINS = [